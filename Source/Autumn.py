@@ -137,7 +137,8 @@ args = parser.parse_args()
 try:
     load_pickles()
 
-    os.system("")
+    if os.name == "nt":  # enable ANSI escape codes in the Windows console (elsewhere this only spawns a shell)
+        os.system("")
     print()
 
     if args.command == 'start':
@@ -147,13 +148,13 @@ try:
     elif args.command == 'status':
         status_command(args.index) if args.index is not None else status_command()
     elif args.command == 'track':
-        if args.date and args.date.lower() != "yesterday":  # if date is there and is not yesterday, add that date
-            start = args.date + " " + args.start
-            end = args.date + " " + args.end
-        elif args.date and args.date.lower() == "yesterday":  # if date is there and is yesterday, add yesterday's date
+        if args.date and args.date.lower() == "yesterday":  # if date is there and is yesterday, add yesterday's date
             yesterday = (datetime.today() - timedelta(days=1)).strftime("%m-%d-%Y")
             start = yesterday + " " + args.start
             end = yesterday + " " + args.end
+        elif args.date:  # if date is there and is not yesterday, add that date
+            start = args.date + " " + args.start
+            end = args.date + " " + args.end
         else:
             start = args.start
             end = args.end
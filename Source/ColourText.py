@@ -49,21 +49,22 @@ format_codes = {
 }
 
 
+# patterns used by format_text()
+format_codes_pattern = re.compile('|'.join(rf"\[{code}\]" for code in format_codes))
+text256_pattern = re.compile(r"\[_text256_(\d+)_\]")
+background256_pattern = re.compile(r"\[_background256_(\d+)_\]")
+
+
 def format_text(line="", colour_code=0):
-    pattern = '|'.join(rf"\[{code}\]" for code in format_codes)
-    line = re.sub(pattern, lambda match: format_codes[match.group()[1:-1]], line)
+    line = format_codes_pattern.sub(lambda match: format_codes[match.group()[1:-1]], line)
 
-    line = re.sub(r"\[_text256\]", u"\u001b[38;5;" + str(colour_code) + "m", line)
+    line = line.replace("[_text256]", u"\u001b[38;5;" + str(colour_code) + "m")
 
-    line = re.sub(r"\[_background256\]", u"\u001b[48;5;" + str(colour_code) + "m", line)
+    line = line.replace("[_background256]", u"\u001b[48;5;" + str(colour_code) + "m")
 
-    matches = re.findall(r"\[_text256_(\d+)_\]", line)
-    for match in matches:
-        line = re.sub(rf"\[_text256_{match}_\]", u"\u001b[38;5;" + match + "m", line)
+    line = text256_pattern.sub(lambda match: u"\u001b[38;5;" + match.group(1) + "m", line)
 
-    matches = re.findall(r"\[_background256_(\d+)_\]", line)
-    for match in matches:
-        line = re.sub(rf"\[_background256_{match}_\]", u"\u001b[48;5;" + match + "m", line)
+    line = background256_pattern.sub(lambda match: u"\u001b[48;5;" + match.group(1) + "m", line)
 
     return line
 
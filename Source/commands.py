@@ -1,7 +1,7 @@
 import os
+import subprocess
 import _pickle as pickle
 from config import get_base_path
-from charts import *
 from timer import Timer
 from projects import Projects
 from ColourText import format_text
@@ -11,6 +11,16 @@ project_dict = Projects()
 timer_list = []
 pickles_path = os.path.join(get_base_path(), 'active_timers.pkl')
 
+no_projects_message = ("No projects created. "
+                       "You can create projects using the [bright green][italics]start[reset] command")
+
+# list_projects headings for each project status, in the order they are listed
+status_headings = (
+    ('complete', "[yellow][underline][italic]Complete:[reset] "),
+    ('paused', "[magenta][underline][italic]Paused:[reset] "),
+    ('active', "[underline][green][italic]Active:[reset] "),
+)
+
 
 def save_pickles():
     with open(pickles_path, 'wb') as output:
@@ -32,24 +42,33 @@ def print_timers():
         timer_list[index].time_spent()
 
 
+def print_names(names: list, per_line=5):
+    """
+    Print a comma separated list of names, a few names per line, in a single write.
+    """
+    lines = [", ".join(names[i:i + per_line]) for i in range(0, len(names), per_line)]
+    print(", \n".join(lines))
+
+
 def start_command(name, subprojects):
     global project_dict
     global timer_list
 
-    if name not in project_dict.get_keys():
+    if name not in project_dict:
         x = input(format_text(f"'[bright red]{name}[reset]' does not exist. Create it? \n[Y/N]: "))
         if x in ["Y", "y"]:
             project_dict.create_project(name, subprojects)
         else:
             return
 
-    project_status = project_dict.get_project(name)['Status']
+    project = project_dict.get_project(name)
+    project_status = project['Status']
     if project_status != "active":
         print(format_text(f"Cannot start a timer for a '[bright magenta]{project_status}[reset]' project."))
         return
 
     for sub_proj in subprojects:
-        if sub_proj not in project_dict.get_project(name)['Sub Projects']:
+        if sub_proj not in project['Sub Projects']:
             x = input(format_text(f"Sub-project '[_text256_26_]{sub_proj}[reset]' does not exist. "
                                   f"Create it? "
                                   f"\n[Y/N]: ")
@@ -134,7 +153,7 @@ def stop_command(index=-1):
 
         timer = timer_list[index]
 
-        if timer.proj_name not in project_dict.get_keys():
+        if timer.proj_name not in project_dict:
             x = input(format_text(f"'[bright red]{timer.proj_name}[reset]' does not exist. Create it? \n[Y/N]: "))
             if x in ["Y", "y"]:
                 project_dict.create_project(timer.proj_name, timer.sub_projs)
@@ -154,7 +173,7 @@ def stop_command(index=-1):
 
 def export_to_watson(project_name):
     global project_dict
-    if project_name not in project_dict.get_keys():
+    if project_name not in project_dict:
         print(format_text(f"'[bright red]{project_name}[reset]' does not exist."))
         return
 
@@ -175,13 +194,16 @@ def export_to_watson(project_name):
             start_time = datetime.strftime(date, "%Y-%m-%d") + " " + datetime.strftime(start_time, "%H:%M:%S")
             end_time = datetime.strftime(date, "%Y-%m-%d") + " " + datetime.strftime(end_time, "%H:%M:%S")
 
-        trackWatson = f'watson add --from "{start_time}" --to "{end_time}" ' \
-                      f'{project_name}'
+        watson_args = ["watson", "add", "--from", start_time, "--to", end_time, project_name]
         for sub_proj in session["Sub-Projects"]:
-            trackWatson += f" + {sub_proj}"
+            watson_args += ["+", sub_proj]
 
-        print(trackWatson)
-        os.system(trackWatson)
+        print(subprocess.list2cmdline(watson_args))
+        try:
+            subprocess.run(watson_args)
+        except FileNotFoundError:
+            print(format_text("[bright red]watson[reset] is not installed or is not on your PATH."))
+            return
 
 
 def track_project(start_time, end_time, project, sub_projects, session_note):
@@ -194,91 +216,41 @@ def list_projects():
     projects = project_dict.get_keys()
 
     if len(projects) == 0:
-        print(format_text("No projects created. "
-                          "You can create projects using the [bright green][italics]start[reset] command"))
-
-    active_projects = [project for project in projects if project_dict.get_project(project)['Status'] == 'active']
-    paused_projects = [project for project in projects if project_dict.get_project(project)['Status'] == 'paused']
-    complete_projects = [project for project in projects if project_dict.get_project(project)['Status'] == 'complete']
-
-    if len(complete_projects) > 0:
-        print(format_text(f"[yellow][underline][italic]Complete:[reset] "))
-        length = len(complete_projects)
-
-        for i in range(length):
-            output = f"{complete_projects[i]}, "
-            if i == length - 1:
-                output = f"{complete_projects[i]}"
-
-            print("", end=output)
-
-            if (i + 1) % 5 == 0:
-                print()
-        print("\n")
-
-    if len(paused_projects) > 0:
-        print(format_text(f"[magenta][underline][italic]Paused:[reset] "))
-        length = len(paused_projects)
-
-        for i in range(length):
-            output = f"{paused_projects[i]}, "
-            if i == length - 1:
-                output = f"{paused_projects[i]}"
+        print(format_text(no_projects_message))
 
-            print("", end=output)
+    # group the projects by status in a single pass
+    projects_by_status = {status: [] for status, _ in status_headings}
+    for project in projects:
+        projects_by_status.setdefault(project_dict.get_project(project)['Status'], []).append(project)
 
-            if (i + 1) % 5 == 0:
-                print()
-        print("\n")
-
-    if len(active_projects) > 0:
-        print(format_text(f"[underline][green][italic]Active:[reset] "))
-        length = len(active_projects)
-
-        for i in range(length):
-            output = f"{active_projects[i]}, "
-            if i == length - 1:
-                output = f"{active_projects[i]}"
-
-            print("", end=output)
-
-            if (i + 1) % 5 == 0:
-                print()
-        print()
+    listed_groups = [(heading, projects_by_status[status]) for status, heading in status_headings
+                     if len(projects_by_status[status]) > 0]
+    for i, (heading, names) in enumerate(listed_groups):
+        if i > 0:  # blank line between status groups
+            print()
+        print(format_text(heading))
+        print_names(names)
 
 
 def list_subs(project: str):
     global project_dict
 
-    if project not in project_dict.get_keys():
+    if project not in project_dict:
         print(format_text(f"'[bright red]{project}[reset]' does not exist."))
         return
     elif project == "":
         return
 
     sub_projects = list(project_dict.get_project(project)['Sub Projects'].keys())
-    length = len(sub_projects)
     print(format_text(f"[underline]{project} sub-projects:[reset] "))
-
-    for i in range(length):
-        output = f"{sub_projects[i]}, "
-        if i == length - 1:
-            output = f"{sub_projects[i]}"
-
-        print("", end=output)
-
-        if (i + 1) % 5 == 0:
-            print()
-
-    print()
+    print_names(sub_projects)
 
 
 def show_totals(projects=None, status=None):
     global project_dict
 
     if len(project_dict) == 0:
-        print(format_text("No projects created. "
-                          "You can create projects using the [bright green][italics]start[reset] command"))
+        print(format_text(no_projects_message))
 
     if not projects and not status:
         project_dict.get_totals()
@@ -321,8 +293,7 @@ def backup_projects():
     global project_dict
 
     if len(project_dict) == 0:
-        print(format_text("No projects created. "
-                          "You can create projects using the [bright green][italics]start[reset] command"))
+        print(format_text(no_projects_message))
         return
 
     backup_path = project_dict.backup()
@@ -334,15 +305,15 @@ def backup_projects():
 
 def restore_projects(backup_path=None, backup_date=None):
     global project_dict
+    backup_dir = os.path.join(get_base_path(), "Backups")
 
     if not backup_path and not backup_date:
         # get the most recent backup from the backup folder
-        backup_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)), "Backups")
         backup_path = max([os.path.join(backup_dir, f) for f in os.listdir(backup_dir)], key=os.path.getctime)
     elif backup_date:
-        for f in os.listdir(os.path.join(os.path.dirname(os.path.realpath(__file__)), "Backups")):
+        for f in os.listdir(backup_dir):
             if backup_date in f:
-                backup_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), "Backups", f)
+                backup_path = os.path.join(backup_dir, f)
                 break
 
     if not backup_path or not os.path.exists(backup_path):
@@ -351,10 +322,9 @@ def restore_projects(backup_path=None, backup_date=None):
         elif not backup_path and backup_date:
             print(format_text(f"Backup for date: [yellow]{backup_date}[reset] not found.\nSaved backups:"))
 
-        basepath = os.path.join(os.path.dirname(os.path.realpath(__file__)), "Backups")
-        for index, f in enumerate(os.listdir(basepath)):
+        for index, f in enumerate(os.listdir(backup_dir)):
             if index == 0:
-                print(format_text(f"Base Directory: [cyan]{basepath}[reset]"))
+                print(format_text(f"Base Directory: [cyan]{backup_dir}[reset]"))
             print(format_text(
                 f"[yellow]{index + 1}. {os.path.basename(f)}[reset]"
             ))
@@ -382,7 +352,7 @@ def quit_autumn():
 def mark_project_complete(name):
     global project_dict
 
-    if name not in project_dict.get_keys():
+    if name not in project_dict:
         print(format_text(f"'[bright red]{name}[reset]' does not exist."))
         return
 
@@ -394,7 +364,7 @@ def mark_project_complete(name):
 def mark_project_paused(name):
     global project_dict
 
-    if name not in project_dict.get_keys():
+    if name not in project_dict:
         print(format_text(f"'[bright red]{name}[reset]' does not exist."))
         return
 
@@ -405,7 +375,7 @@ def mark_project_paused(name):
 def mark_project_active(name):
     global project_dict
 
-    if name not in project_dict.get_keys():
+    if name not in project_dict:
         print(format_text(f"'[bright red]{name}[reset]' does not exist."))
         return
 
@@ -416,16 +386,17 @@ def mark_project_active(name):
 def rename_project(name: str, new_name: str):
     global project_dict
 
-    if name not in project_dict.get_keys():
+    if name not in project_dict:
         print(format_text(f"'[bright red]{name}[reset]' does not exist."))
         return
-    elif new_name in project_dict.get_keys():
+    elif new_name in project_dict:
         print(format_text(f"A project called '[bright red]{new_name}[reset]' already exists. Merging instead..."))
-        # call merge_projects
-        merge_projects(name, new_name, new_name)
+        with project_dict.batch():
+            # call merge_projects
+            merge_projects(name, new_name, new_name)
 
-        # then delete the old project
-        project_dict.delete_project(name)
+            # then delete the old project
+            project_dict.delete_project(name)
         return
     elif name == "":
         return
@@ -440,7 +411,7 @@ def rename_project(name: str, new_name: str):
 def remove_subproject(project: str, subproject: str):
     global project_dict
 
-    if project not in project_dict.get_keys():
+    if project not in project_dict:
         print(format_text(f"'[bright red]{project}[reset]' does not exist."))
         return
     elif project == "":
@@ -457,7 +428,7 @@ def remove_subproject(project: str, subproject: str):
 def rename_subproject(project: str, subproject: str, new_sub_name: str):
     global project_dict
 
-    if project not in project_dict.get_keys():
+    if project not in project_dict:
         print(format_text(f"'[bright red]{project}[reset]' does not exist."))
         return
     elif project == "":
@@ -482,7 +453,7 @@ def rename_subproject(project: str, subproject: str, new_sub_name: str):
 def delete_project(project: str):
     global project_dict
 
-    if project not in project_dict.get_keys():
+    if project not in project_dict:
         print(format_text(f"'[bright red]{project}[reset]' does not exist."))
         return
     elif project == "":
@@ -497,10 +468,10 @@ def delete_project(project: str):
 def merge_projects(first_project: str, second_project: str, new_name: str):
     global project_dict
 
-    if first_project not in project_dict.get_keys():
+    if first_project not in project_dict:
         print(format_text(f"Invalid project name! '[bright red]{first_project}[reset]' does not exist!"))
         return
-    if second_project not in project_dict.get_keys():
+    if second_project not in project_dict:
         print(format_text(f"Invalid project name! '[bright red]{second_project}[reset]' does not exist!"))
         return
 
@@ -550,8 +521,9 @@ def export(projects: list, filename: str):
     x = input(format_text(f"Are you sure you want to export [yellow]{projects}[reset] to file '{filename}'?\n[Y/N]: "))
 
     if x == "Y" or x == "y":
-        for project in projects:
-            project_dict.export_project(project, filename)
+        with project_dict.batch():
+            for project in projects:
+                project_dict.export_project(project, filename)
 
         print(format_text(f"Exported [yellow]{projects}[reset] to '{filename}'"))
 
@@ -566,10 +538,11 @@ def import_exported(projects: list, filename: str):
                           f" from file '{filename}'?\n[Y/N]: "))
 
     if x == "Y" or x == "y":
-        if not projects:
-            project_dict.load_exported(filename, "all")
-        for project in projects:
-            project_dict.load_exported(filename, project)
+        with project_dict.batch():
+            if not projects:
+                project_dict.load_exported(filename, "all")
+            for project in projects:
+                project_dict.load_exported(filename, project)
 
         # print(format_text(f"Imported [yellow]{projects if projects else 'everything'}[reset] from '{filename}'"))
 
@@ -583,8 +556,7 @@ def get_logs(**kwargs):
     global project_dict
 
     if len(project_dict) == 0:
-        print(format_text("No projects created. "
-                          "You can create projects using the [bright green][italics]start[reset] command"))
+        print(format_text(no_projects_message))
 
     if len(kwargs.keys()) == 0:
         project_dict.log()
@@ -595,6 +567,9 @@ def get_logs(**kwargs):
 
 
 def chart(projects="all", chart_type="pie", status=None, annotate=False, accuracy=0):
+    # charts pulls in matplotlib, seaborn, pandas and calplot, so only import it when a chart is actually drawn
+    from charts import showBarGraphs, showPieChart, showScatterGraph, showHeatMap, showCalendar
+
     global project_dict
     keys = project_dict.get_keys()
 
@@ -623,7 +598,7 @@ def chart(projects="all", chart_type="pie", status=None, annotate=False, accurac
             projects = keys
 
     if len(projects) == 1:
-        if projects[0] not in keys:
+        if projects[0] not in project_dict:
             print(f"Invalid project name! '{projects[0]}' does not exist!")
             return
 
@@ -648,7 +623,7 @@ def chart(projects="all", chart_type="pie", status=None, annotate=False, accurac
 
     else:
         for name in projects:
-            if name in keys and len(projects) > 1:
+            if name in project_dict and len(projects) > 1:
                 time_totals.append(project_dict.get_project(name)["Total Time"] / 60)
                 sess_hist = project_dict.get_project(name)["Session History"]
                 dates = [datetime.strptime(sess['Date'], "%m-%d-%Y") for sess in sess_hist]
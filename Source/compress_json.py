@@ -11,6 +11,11 @@ import base64
 import json
 import zlib
 
+try:  # optional, much faster json encoder/decoder. falls back to the standard library json module
+    import orjson
+except ImportError:
+    orjson = None
+
 ZIPJSON_KEY = 'base64(zip(o))'
 
 
@@ -19,7 +24,7 @@ def json_zip(j):
     j = {
         ZIPJSON_KEY: base64.b64encode(
             zlib.compress(
-                json.dumps(j).encode('utf-8')
+                orjson.dumps(j) if orjson else json.dumps(j).encode('utf-8')
             )
         ).decode('ascii')
     }
@@ -43,7 +48,7 @@ def json_unzip(j, insist=True):
         raise RuntimeError("Could not decode/unzip the contents")
 
     try:
-        j = json.loads(j)
+        j = orjson.loads(j) if orjson else json.loads(j)
     except:
         raise RuntimeError("Could interpret the unzipped contents")
 
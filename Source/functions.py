@@ -16,7 +16,15 @@ def listOfDates(fromDate: str, toDate: str):
     if fromDate > toDate:
         return None
 
-    return [(toDate + timedelta(days=-i)).strftime("%m-%d-%Y") for i in range((toDate - fromDate).days + 1)]
+    # walk back one day at a time from toDate (newest first)
+    dates = []
+    day = toDate
+    step = timedelta(days=1)
+    while day >= fromDate:
+        dates.append(f"{day.month:02d}-{day.day:02d}-{day.year:04d}")
+        day -= step
+
+    return dates
 
 
 def td_str(td: timedelta):
@@ -28,29 +36,14 @@ def td_str(td: timedelta):
     days = td.days
     hrs, remainder = divmod(td.seconds, 3600)
     minutes, seconds = divmod(remainder, 60)
-    plural_form = lambda counter: 's'[:counter ^ 1]
-
-    if days > 0:
-        days_str = f"{days} day{plural_form(days)} "
-    else:
-        days_str = ""
-
-    if hrs > 0:
-        hrs_str = f"{hrs} hour{plural_form(hrs)} "
-    else:
-        hrs_str = ""
-
-    if minutes > 0:
-        min_str = f"{minutes} minute{plural_form(minutes)} "
-    else:
-        min_str = ""
 
-    if seconds > 0:
-        sec_str = f"{seconds} second{plural_form(seconds)} "
-    else:
-        sec_str = ""
+    # only non-zero units are formatted, e.g. "2 hours 1 minute "
+    parts = []
+    for count, unit in ((days, "day"), (hrs, "hour"), (minutes, "minute"), (seconds, "second")):
+        if count > 0:
+            parts.append(f"{count} {unit}{'s' if count != 1 else ''} ")
 
-    return f"{days_str}{hrs_str}{min_str}{sec_str}"
+    return "".join(parts)
 
 
 def get_date_last(period_str: str):
@@ -1,12 +1,36 @@
 import os
 import json
-from timer import td_str
+import time
+from functools import lru_cache
+from contextlib import contextmanager
+from timer import td_str, SessionOut
 from datetime import datetime
 from datetime import timedelta
 from config import get_base_path
 from functions import listOfDates
 from ColourText import format_text
-from compress_json import json_unzip, json_zip, ZIPJSON_KEY
+from compress_json import json_unzip, json_zip, ZIPJSON_KEY, orjson
+
+
+@lru_cache(maxsize=None)
+def _parse_date(date_str: str):
+    """
+    Parse a session/project date string (MM-DD-YYYY). Results are cached since the same handful of dates
+    are parsed over and over when sorting, merging and logging session histories.
+    """
+    return datetime.strptime(date_str, "%m-%d-%Y")
+
+
+def _format_duration(minutes: float):
+    """
+    Format a duration in minutes as 'HHh MMm', or 'MMm SSs' if it is under an hour.
+    """
+    # whole seconds (dropping the fraction, after rounding off float noise), then split with divmod
+    hours, remainder = divmod(int(round(minutes * 60, 6)), 3600)
+    mins, secs = divmod(remainder, 60)
+    if hours > 0:
+        return f"{hours:02d}h {mins:02d}m"
+    return f"{mins:02d}m {secs:02d}s"
 
 
 class Projects:
@@ -19,6 +43,8 @@ class Projects:
         self.path = os.path.join(get_base_path(), file)
         self.exported_path = os.path.join(get_base_path(), "Exported")
         self.__status_tags = ["active", "paused", "complete"]
+        self.__batch_depth = 0
+        self.__unsaved_changes = False
 
         self.__load()
 
@@ -35,9 +61,8 @@ class Projects:
                 os.mkdir(archive_dir)
 
             if not os.path.exists(archive_file):
-                prjct_json = json.dumps(self.__dict, indent=4)
                 with open(archive_file, "w") as json_writer:
-                    json_writer.write(prjct_json)
+                    json.dump(self.__dict, json_writer, indent=4)
 
                 # empty dict and save
                 self.__dict.clear()
@@ -52,6 +77,9 @@ class Projects:
     def __len__(self):
         return len(self.__dict)
 
+    def __contains__(self, name):
+        return name in self.__dict
+
     def get_keys(self):
         """
         :return: a list of all the existing project names
@@ -70,8 +98,26 @@ class Projects:
 
         return self.__dict[name]
 
+    @contextmanager
+    def batch(self):
+        """
+        Group several changes into a single save. Saves made inside the block are deferred and the projects
+        file is written once when the (outermost) block exits. If the block raises, nothing is saved and the
+        exception is passed on.
+        """
+        self.__batch_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self.__batch_depth -= 1
+            raise
+        else:
+            self.__batch_depth -= 1
+            if self.__batch_depth == 0 and self.__unsaved_changes:
+                self.__save()
+
     def __last_save_date(self):
-        dates = [datetime.strptime(self.__dict[project]['Last Updated'], "%m-%d-%Y") for project in self.__dict]
+        dates = [_parse_date(self.__dict[project]['Last Updated']) for project in self.__dict]
         dates.sort()
 
         if len(dates) == 0:
@@ -111,23 +157,24 @@ class Projects:
             print(f"Invalid project name! '{name}' does not exist!")
             return
 
-        if sub_name not in self.__dict[name]['Sub Projects']:
+        sub_projects = self.__dict[name]['Sub Projects']
+        if sub_name not in sub_projects:
             print(f"Invalid subproject name! '{sub_name}' does not exist!")
             return
 
         # rename 'Sub Projects' keys
-        if new_sub_name in self.__dict[name]['Sub Projects']:
+        if new_sub_name in sub_projects:
             print(f"Subproject name '{new_sub_name}' already exists, merging subprojects...")
             # merge the subprojects
-            self.__dict[name]['Sub Projects'][new_sub_name] += self.__dict[name]['Sub Projects'].pop(sub_name)
+            sub_projects[new_sub_name] += sub_projects.pop(sub_name)
         else:
-            self.__dict[name]['Sub Projects'][new_sub_name] = self.__dict[name]['Sub Projects'].pop(sub_name)
+            sub_projects[new_sub_name] = sub_projects.pop(sub_name)
 
         # rename all the subproject entries in the session history
-        for index in range(len(self.__dict[name]['Session History'])):
-            self.__dict[name]['Session History'][index]['Sub-Projects'] = \
-                [new_sub_name if x == sub_name else x for x in
-                 self.__dict[name]['Session History'][index]['Sub-Projects']]
+        for session in self.__dict[name]['Session History']:
+            session_subs = session['Sub-Projects']
+            if sub_name in session_subs:
+                session['Sub-Projects'] = [new_sub_name if x == sub_name else x for x in session_subs]
 
         self.__save()
 
@@ -185,9 +232,10 @@ class Projects:
                 for sub_name in sub_names:
                     sub_projects[sub_name] = 0.0
 
+            today = datetime.today().strftime("%m-%d-%Y")
             self.__dict[name] = {
-                'Start Date': datetime.today().strftime("%m-%d-%Y"),
-                'Last Updated': datetime.today().strftime("%m-%d-%Y"),
+                'Start Date': today,
+                'Last Updated': today,
                 'Total Time': 0.0,
                 'Status': self.__status_tags[0],
                 'Sub Projects': sub_projects,
@@ -196,12 +244,11 @@ class Projects:
         self.__save()
         return True
 
-    def update_project(self, session_out: tuple, name: str, sub_names=None,
-                       update_date=datetime.today().strftime("%m-%d-%Y")):
+    def update_project(self, session_out: SessionOut, name: str, sub_names=None, update_date=None):
         """
         Save project session history.
 
-        :param session_out: a tuple with the session info including duration, session note, start and end time
+        :param session_out: SessionOut with the session duration, note, start and end time
         :param name: project to update
         :param sub_names: list of session subprojects
         :param update_date: date the project was tracked. set to current date by default.
@@ -211,21 +258,25 @@ class Projects:
             print(f"Invalid project name! '{name}' does not exist!")
             return
 
-        duration = session_out[0]
-        session_note = session_out[1]
+        if update_date is None:
+            update_date = datetime.today().strftime("%m-%d-%Y")
+
+        duration, session_note, start, end = session_out
 
-        if type(session_out[2]) is not datetime:
-            start_time = datetime.fromtimestamp(session_out[2]).strftime('%X')
-            end_time = datetime.fromtimestamp(session_out[3]).strftime('%X')
+        # HH:MM:SS start and end times
+        if type(start) is not datetime:
+            start_tm, end_tm = time.localtime(start), time.localtime(end)
+            start_time = f"{start_tm.tm_hour:02d}:{start_tm.tm_min:02d}:{start_tm.tm_sec:02d}"
+            end_time = f"{end_tm.tm_hour:02d}:{end_tm.tm_min:02d}:{end_tm.tm_sec:02d}"
         else:
-            start_time = session_out[2].strftime('%X')
-            end_time = session_out[3].strftime('%X')
+            start_time = f"{start.hour:02d}:{start.minute:02d}:{start.second:02d}"
+            end_time = f"{end.hour:02d}:{end.minute:02d}:{end.second:02d}"
 
         total_time = float(self.__dict[name]['Total Time']) + duration
         self.__dict[name]['Total Time'] = round(total_time, 2)
 
         if sub_names is not None:
-            sub_projects = dict(self.__dict[name]['Sub Projects'])
+            sub_projects = self.__dict[name]['Sub Projects']  # updated in place, no copy needed
 
             for sub_name in sub_names:
                 if sub_name in sub_projects:
@@ -234,11 +285,8 @@ class Projects:
                 else:
                     sub_projects[sub_name] = duration
 
-            self.__dict[name]['Sub Projects'] = sub_projects
-
         self.__dict[name]['Last Updated'] = update_date if \
-            datetime.strptime(update_date, "%m-%d-%Y") > \
-            datetime.strptime(self.__dict[name]['Last Updated'], "%m-%d-%Y") \
+            _parse_date(update_date) > _parse_date(self.__dict[name]['Last Updated']) \
             else self.__dict[name]['Last Updated']
 
         history_log = {
@@ -272,24 +320,26 @@ class Projects:
         :param session_note: session note
         """
 
-        def check_date(time):
+        today = datetime.today()
+
+        def check_date(time_str):
             # check if date is specified in the time string, if not set it to today
-            if len(time.split(" ")) == 1:  # if only time is specified
-                time = datetime.strptime(time, '%H:%M')
-                time = time.replace(year=datetime.today().year, month=datetime.today().month, day=datetime.today().day)
-                return time
+            if len(time_str.split(" ")) == 1:  # if only time is specified
+                session_time = datetime.strptime(time_str, '%H:%M')
+                session_time = session_time.replace(year=today.year, month=today.month, day=today.day)
+                return session_time
             else:
-                return datetime.strptime(time, '%m-%d-%Y %H:%M')
+                return datetime.strptime(time_str, '%m-%d-%Y %H:%M')
 
-        def check_year(time):
-            time = check_date(time)
-            if time.year != datetime.today().year:
-                print(format_text(f"Year entered as [cyan]{time.year}[reset]. "
-                                  f"Did you mean [cyan]{datetime.today().year}[reset]?"))
+        def check_year(time_str):
+            session_time = check_date(time_str)
+            if session_time.year != today.year:
+                print(format_text(f"Year entered as [cyan]{session_time.year}[reset]. "
+                                  f"Did you mean [cyan]{today.year}[reset]?"))
                 confirm = input("[Y/N]: ")
                 if confirm.lower() == 'y':
-                    time = time.replace(year=datetime.today().year)
-            return time
+                    session_time = session_time.replace(year=today.year)
+            return session_time
 
         start_time = check_year(start_time.strip())
         end_time = check_year(end_time.strip())
@@ -323,16 +373,11 @@ class Projects:
             print(format_text(f"Invalid session time. End time cannot be before start time."))
             return
 
-        self.update_project((duration, session_note, start_time, end_time), project, sub_projects, update_date)
+        self.update_project(SessionOut(duration, session_note, start_time, end_time), project, sub_projects, update_date)
 
         sub_projects = [f"[_text256_26_]{sub_proj}[reset]" for sub_proj in sub_projects]
 
-        duration = str(timedelta(minutes=duration)).split('.')[0]
-        duration = datetime.strptime(duration, "%H:%M:%S")
-        if duration.hour > 0:
-            duration = duration.strftime("%Hh %Mm")
-        else:
-            duration = duration.strftime("%Mm %Ss")
+        duration = _format_duration(duration)
 
         print(format_text(f"Tracked [bright red]{project}[reset] "
                           f"{sub_projects} from [cyan]{start_time.strftime('%X')}[reset]"
@@ -351,13 +396,11 @@ class Projects:
 
             merged_project = {
                 'Start Date': project1['Start Date'] if
-                datetime.strptime(project1['Start Date'], '%m-%d-%Y') < datetime.strptime(project2['Start Date'],
-                                                                                          '%m-%d-%Y')
+                _parse_date(project1['Start Date']) < _parse_date(project2['Start Date'])
                 else project2['Start Date'],
 
                 'Last Updated': project1['Last Updated'] if
-                datetime.strptime(project1['Last Updated'], '%m-%d-%Y') > datetime.strptime(project2['Last Updated'],
-                                                                                            '%m-%d-%Y')
+                _parse_date(project1['Last Updated']) > _parse_date(project2['Last Updated'])
                 else project2['Last Updated'],
 
                 "Status": project1['Status'],
@@ -372,7 +415,7 @@ class Projects:
                         *project2['Session History']
                     ],
                     # sort array by date and end time
-                    key=lambda x: (datetime.strptime(x['Date'], '%m-%d-%Y'),
+                    key=lambda x: (_parse_date(x['Date']),
                                    datetime.strptime(x["End Time"], "%H:%M:%S")
                                    )
                 ),
@@ -399,7 +442,7 @@ class Projects:
         backup_path = os.path.join(backup_dir, f"backup-{self.__last_save_date().strftime('%m-%d-%Y')}.json")
         try:
             with open(backup_path, 'w') as f:
-                f.write(json.dumps(self.__dict, indent=4))
+                json.dump(self.__dict, f, indent=4)
             return backup_path
         except Exception as e:
             print(f"An error occurred when trying to create a backup projects: {e}")
@@ -476,28 +519,29 @@ class Projects:
             return False
 
         # use the merge method to merge the remote projects with the local projects
-        for project in {**self.__dict, **remote_data}:  # combine the project keys of both dicts
-            if project in self.get_keys() and project in remote_data.keys():
-                self.merge(self.__dict[project], remote_data[project],
-                           project)  # the project have the same name, so they will be merged into one project
-                print(format_text(f"[yellow]{project}[reset] already exists, merging..."))
-            elif project not in remote_data.keys():
-                print(format_text(f"[green]{project}[reset] not found in remote file, adding..."))
-            else:
-                self.__dict[project] = remote_data[project]  # otherwise just add the project to the local projects
-                print(format_text(f"[green]{project}[reset] added to projects"))
+        with self.batch():
+            for project in {**self.__dict, **remote_data}:  # combine the project keys of both dicts
+                if project in self.__dict and project in remote_data:
+                    self.merge(self.__dict[project], remote_data[project],
+                               project)  # the project have the same name, so they will be merged into one project
+                    print(format_text(f"[yellow]{project}[reset] already exists, merging..."))
+                elif project not in remote_data.keys():
+                    print(format_text(f"[green]{project}[reset] not found in remote file, adding..."))
+                else:
+                    self.__dict[project] = remote_data[project]  # otherwise just add the project to the local projects
+                    print(format_text(f"[green]{project}[reset] added to projects"))
 
-        # save the local projects
-        self.__save()
+            # save the local projects
+            self.__save()
 
         # update remote file
         try:
             with open(filepath, 'w') as f:
                 # compress the data before writing it to the file if the file was originally compressed
                 if is_compressed:
-                    f.write(json.dumps(json_zip(self.__dict)))
+                    json.dump(json_zip(self.__dict), f)
                 else:  # otherwise just write the data to the file
-                    f.write(json.dumps(self.__dict, indent=4))
+                    json.dump(self.__dict, f, indent=4)
         except Exception as e:
             print(f"An error occurred when trying to update the remote file: {e}")
             return False
@@ -541,6 +585,28 @@ class Projects:
         project['Total Time'] = round(project['Total Time'], 2)
         return project  # update the project in the projects dict
 
+    def __select_projects(self, projects="all", status=None):
+        """
+        Private method that resolves the projects a command should show.
+
+        :param projects: list of project names, or 'all' for every project
+        :param status: when showing all projects, only keep 'active', 'paused', or 'completed' projects
+        :return: list of existing project names. Names that don't exist are reported and skipped.
+        """
+        if str(projects).lower() == 'all':
+            if status and status in self.__status_tags:
+                return [key for key, project in self.__dict.items() if project['Status'] == status]
+            return self.get_keys()
+
+        valid_projects = []
+        for prjct in projects:
+            if prjct not in self.__dict:
+                print(format_text(f"Invalid project name! '[bright red]{prjct}[reset]' does not exist!"))
+            else:
+                valid_projects.append(prjct)
+
+        return valid_projects
+
     def log(self, projects="all", fromDate=None, toDate=None, status=None, sessionNotes=True, noteLength=300):
         """
         Print the session histories of projects over a given period.
@@ -553,19 +619,7 @@ class Projects:
         :param noteLength: maximum note length that can be printed before the note is replaced with an ellipse (...)
         """
 
-        valid_projects = []
-        keys = self.get_keys()
-
-        if str(projects).lower() == 'all':
-            valid_projects = keys
-            if status and status in self.__status_tags:
-                valid_projects = [key for key in keys if self.__dict[key]['Status'] == status]
-        else:
-            for prjct in projects:
-                if prjct not in keys:
-                    print(format_text(f"Invalid project name! '[bright red]{prjct}[reset]' does not exist!"))
-                else:
-                    valid_projects.append(prjct)
+        valid_projects = self.__select_projects(projects, status)
 
         dates = listOfDates(fromDate, toDate)
 
@@ -574,27 +628,16 @@ class Projects:
                               f'than start date [cyan]"{fromDate}"[reset].'))
             return
 
-        # create a sessions list
-        sessions_list = [(project, self.__dict[project]["Session History"]) for project in valid_projects]
-        cleaned_sessions = []
-
-        for project, session_list in sessions_list:
-            for session in session_list:
-                if session["Date"] in dates:
-                    cleaned_sessions.append((project, session))
+        # keep the sessions that fall within the date range
+        dates = set(dates)
+        cleaned_sessions = [(project, session) for project in valid_projects
+                            for session in self.__dict[project]["Session History"] if session["Date"] in dates]
 
-        # sort sessions list by end time
-        session_list = sorted(cleaned_sessions, key=lambda x: datetime.strptime(x[1]["End Time"], "%H:%M:%S"))
+        # sort sessions list by end time. times are zero-padded HH:MM:SS strings, so they sort correctly as text
+        session_list = sorted(cleaned_sessions, key=lambda x: x[1]["End Time"])
 
         # Sort session_list by date
-        session_list.sort(key=lambda x: datetime.strptime(x[1]['Date'], "%m-%d-%Y"))
-
-        def format_time(time):
-            if time.hour > 0:
-                time = time.strftime("%Hh %Mm")
-            else:
-                time = time.strftime("%Mm %Ss")
-            return time
+        session_list.sort(key=lambda x: _parse_date(x[1]['Date']))
 
         def truncate_note(nte, nteLength):
             if len(nte) > nteLength:
@@ -608,11 +651,9 @@ class Projects:
         day_total = 0.0
 
         def print_date_output(crrnt_date, d_total):
-            print_date = datetime.strptime(crrnt_date, "%m-%d-%Y")
+            print_date = _parse_date(crrnt_date)
             print_date = print_date.strftime("%A %d %B %Y")
-            d_total = str(timedelta(minutes=d_total)).split(".")[0]
-            d_total = datetime.strptime(d_total, "%H:%M:%S")
-            d_total = format_time(d_total)
+            d_total = _format_duration(d_total)
 
             print(format_text(f"[underline]{print_date}[reset]"
                               f" [_text256_34_]({d_total})[reset]"))
@@ -632,10 +673,8 @@ class Projects:
                 day_total = 0.0
 
             # Calculate time spent and add to day total
-            time_spent = str(timedelta(minutes=session['Duration'])).split(".")[0]
-            time_spent = datetime.strptime(time_spent, "%H:%M:%S")
+            time_spent = _format_duration(session['Duration'])
             day_total += session['Duration']
-            time_spent = format_time(time_spent)
 
             # Format subprojects and note
             sub_projects = [f"[_text256_26_]{sub_proj}[reset]" for sub_proj in session['Sub-Projects']]
@@ -662,24 +701,12 @@ class Projects:
         :param projects: list of project names to show time totals.
         :param status: filter logged projects by status. Log either 'active', 'paused', or 'completed' projects
         """
-        valid_projects = []
-        keys = self.get_keys()
-
-        if str(projects).lower() == 'all':
-            valid_projects = keys
-            if status and status in self.__status_tags:
-                valid_projects = [key for key in keys if self.__dict[key]['Status'] == status]
-        else:
-            for prjct in projects:
-                if prjct not in keys:
-                    print(f"Invalid project name! '{prjct}' does not exist!")
-                else:
-                    valid_projects.append(prjct)
+        valid_projects = self.__select_projects(projects, status)
 
         for prj in valid_projects:
             td = timedelta(minutes=self.__dict[prj]['Total Time'])
-            startDate = datetime.strptime(self.__dict[prj]['Start Date'], "%m-%d-%Y")
-            endDate = datetime.strptime(self.__dict[prj]['Last Updated'], "%m-%d-%Y")
+            startDate = _parse_date(self.__dict[prj]['Start Date'])
+            endDate = _parse_date(self.__dict[prj]['Last Updated'])
             startDate = startDate.strftime("%d %B %Y")
             endDate = endDate.strftime("%d %B %Y")
             print(format_text(f"[bright red]{prj}[reset]: [_text256_34_]{td_str(td)}[reset] "
@@ -747,7 +774,7 @@ class Projects:
         Also call __remove_duplicate_sessions() to remove duplicate sessions when sorting.
         :return:
         """
-        sorted_keys = sorted(self.get_keys(), key=lambda x: x.lower())
+        sorted_keys = sorted(self.__dict, key=str.lower)
         sorted_dict = {}
 
         for key in sorted_keys:
@@ -757,28 +784,51 @@ class Projects:
         self.__dict = sorted_dict
 
     def __save(self):
+        if self.__batch_depth > 0:  # inside a batch() block, save once when the block exits
+            self.__unsaved_changes = True
+            return
+
+        self.__unsaved_changes = False
         self.__sort_dict()
 
-        # compress and dump json data
-        prjct_json = json.dumps(json_zip(self.__dict))
-        with open(self.path, "w") as json_writer:
-            json_writer.write(prjct_json)
+        # compress and dump json data to a temp file, then swap it in so an interrupted save
+        # can't leave a truncated projects file behind. the real path is used so a symlinked
+        # projects file keeps pointing at the updated data
+        zipped = json_zip(self.__dict)
+        real_path = os.path.realpath(self.path)
+        temp_path = f"{real_path}.tmp"
+        try:
+            with open(temp_path, "w") as json_writer:
+                json.dump(zipped, json_writer)
+                json_writer.flush()
+                os.fsync(json_writer.fileno())
+            try:
+                os.replace(temp_path, real_path)
+            except PermissionError:
+                # the projects file is open in another process (e.g. a sync client on Windows), so it
+                # can't be replaced. write it in place instead
+                os.remove(temp_path)
+                with open(real_path, "w") as json_writer:
+                    json.dump(zipped, json_writer)
+        except BaseException:
+            # don't leave a partly written temp file next to the projects file
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
 
     def __load(self):
         if not os.path.exists(self.path):
             return
-        projects = open(self.path, "r").read()
+        with open(self.path, "rb") as json_reader:
+            projects = json_reader.read()
 
-        try:
-            # load and decompress json data
-            self.__dict = json_unzip(json.loads(projects))
-        except ...:
-            # load an uncompressed file
-            self.__dict = json.loads(projects)
+        # load and decompress json data. legacy uncompressed files are returned as is (parsed only once)
+        # and get migrated to the compressed format on the next save
+        self.__dict = json_unzip(orjson.loads(projects) if orjson else json.loads(projects), insist=False)
 
-        for project in self.__dict:
-            if "Status" not in self.__dict[project]:
-                self.__dict[project]["Status"] = self.__status_tags[0]
+        default_status = self.__status_tags[0]
+        for project in self.__dict.values():
+            project.setdefault("Status", default_status)
 
         self.__sort_dict()
 
@@ -811,10 +861,8 @@ class Projects:
 
         file_dict[name] = self.__dict[name]
 
-        prjct_json = json.dumps(file_dict, indent=4)
-
         with open(path, "w") as json_writer:
-            json_writer.write(prjct_json)
+            json.dump(file_dict, json_writer, indent=4)
 
         self.delete_project(name)
 
@@ -3,6 +3,18 @@ from datetime import datetime
 from ColourText import format_text
 from functions import td_str
 import time
+from typing import NamedTuple, Union
+
+
+class SessionOut(NamedTuple):
+    """
+    Info about a finished session: duration in minutes, session note and start/end time
+    (timestamps from a Timer, datetime objects for tracked sessions).
+    """
+    duration: float
+    note: str
+    start: Union[float, datetime]
+    end: Union[float, datetime]
 
 
 class Timer:
@@ -55,13 +67,14 @@ class Timer:
 
         :return: session duration, note, start and end time
         """
+        # read the clock once so the end time, duration and printed stop time all agree
         self._end_time = time.time()
-        self._duration = timedelta(seconds=(time.time() - self._start_time))
+        self._duration = timedelta(seconds=(self._end_time - self._start_time))
 
         print(format_text(f"Stopped [bright red]{self.proj_name}[reset] "
-                          f"{self._formatted_subs} at {datetime.today().strftime('%X')}, "
+                          f"{self._formatted_subs} at {datetime.fromtimestamp(self._end_time).strftime('%X')}, "
                           f"started [_text256_34_]{td_str(self._duration)}[reset]ago"))
 
         duration = self._duration.seconds / 60
         session_note = input("Session Note: ").strip()
-        return duration, session_note, self._start_time, self._end_time
+        return SessionOut(duration, session_note, self._start_time, self._end_time)